@@ -3,12 +3,18 @@
 --------------
 Script inference sederhana menggunakan Flask.
 Memuat model Deep Learning yang telah dilatih dan scaler untuk melakukan prediksi real-time.
+Model Keras (.h5) dikonversi sekali ke TFLite dan dijalankan via tf.lite.Interpreter;
+jika konversi/loading TFLite gagal, model Keras dipakai langsung sebagai fallback.
 """
 
 import pandas as pd
 import numpy as np
 import tensorflow as tf
 import joblib
+import queue
+import tempfile
+import threading
+import time
 from flask import Flask, request, jsonify
 from pathlib import Path
 
@@ -17,57 +23,209 @@ app = Flask(__name__)
 # --- KONFIGURASI PATH ---
 BASE_DIR = Path(__file__).resolve().parent.parent / 'Membangun_model'
 MODEL_PATH = BASE_DIR / 'artifacts' / 'baseline_model.h5'
+TFLITE_MODEL_PATH = MODEL_PATH.with_suffix('.tflite')
 SCALER_PATH = BASE_DIR / 'artifacts' / 'scaler.pkl'
 
+# --- KONFIGURASI MICRO-BATCHING ---
+# Request yang datang bersamaan digabung menjadi satu batch agar overhead
+# scaling & prediksi cukup dibayar sekali per batch.
+MAX_BATCH_SIZE = 32
+MAX_LATENCY_MS = 5
+REQUEST_TIMEOUT_S = 10
+
 # --- LOAD ARTIFACTS ---
 # Karena model dan scaler mungkin belum ada di path relatif saat development,
 # kita tambahkan error handling untuk dummy execution.
-model = None
+interpreter = None
+predict_fn = None
 scaler = None
+scaler_mean = None
+scaler_inv_scale = None
+
+
+def tflite_is_stale():
+    """TFLite perlu di-(re)build jika belum ada atau lebih lama dari .h5 hasil training terakhir."""
+    if not MODEL_PATH.exists():
+        return False
+    return (not TFLITE_MODEL_PATH.exists()
+            or MODEL_PATH.stat().st_mtime > TFLITE_MODEL_PATH.stat().st_mtime)
+
+
+def convert_to_tflite():
+    """
+    Konversi Keras .h5 -> TFLite (dynamic-range quantization).
+    Lewat SavedModel karena TFLiteConverter.from_keras_model tidak mendukung model Keras 3.
+    File ditulis atomik via file sementara.
+    """
+    keras_model = tf.keras.models.load_model(MODEL_PATH, compile=False)
+    with tempfile.TemporaryDirectory() as export_dir:
+        keras_model.export(export_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(export_dir)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        tflite_bytes = converter.convert()
+
+    tmp_path = TFLITE_MODEL_PATH.with_suffix('.tflite.tmp')
+    tmp_path.write_bytes(tflite_bytes)
+    tmp_path.replace(TFLITE_MODEL_PATH)
+
+
+def tflite_predict(batch_data):
+    """Menjalankan TFLite interpreter untuk satu batch (hanya dipanggil dari batch_worker)."""
+    padded = np.zeros((MAX_BATCH_SIZE, batch_data.shape[1]), dtype=np.float32)
+    padded[:len(batch_data)] = batch_data
+    interpreter.set_tensor(input_detail['index'], padded)
+    interpreter.invoke()
+    return interpreter.get_tensor(output_index)[:len(batch_data)]
+
+
+def load_keras_predict_fn():
+    """Fallback: forward pass model Keras yang di-compile sekali menjadi tf.function."""
+    keras_model = tf.keras.models.load_model(MODEL_PATH, compile=False)
 
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, keras_model.input_shape[-1]), dtype=tf.float32)])
+    def keras_forward(x):
+        return keras_model(x, training=False)
+
+    return lambda batch_data: keras_forward(tf.constant(batch_data, dtype=tf.float32)).numpy()
+
+
+# Konversi dipisah dari loading: jika gagal (mis. artifacts/ read-only),
+# interpreter & scaler tetap dimuat dari file yang sudah ada.
 try:
-    if MODEL_PATH.exists():
-        model = tf.keras.models.load_model(MODEL_PATH)
-        print("Model loaded successfully.")
-    else:
-        print(f"Warning: Model not found at {MODEL_PATH}")
+    if tflite_is_stale():
+        convert_to_tflite()
+        print(f"Model converted to TFLite: {TFLITE_MODEL_PATH}")
+except Exception as e:
+    print(f"Error converting model to TFLite: {e}")
+    if TFLITE_MODEL_PATH.exists():
+        print(f"Warning: serving outdated TFLite model {TFLITE_MODEL_PATH} (older than {MODEL_PATH})")
+
+try:
+    if TFLITE_MODEL_PATH.exists():
+        interpreter = tf.lite.Interpreter(model_path=str(TFLITE_MODEL_PATH))
+        input_detail = interpreter.get_input_details()[0]
+        output_index = interpreter.get_output_details()[0]['index']
+        n_features = input_detail['shape'][-1]
+
+        # Tensor dialokasikan sekali dengan ukuran MAX_BATCH_SIZE; batch yang lebih kecil di-pad
+        interpreter.resize_tensor_input(input_detail['index'], [MAX_BATCH_SIZE, n_features])
+        interpreter.allocate_tensors()
+        predict_fn = tflite_predict
+        print("Model loaded successfully (TFLite).")
+except Exception as e:
+    interpreter = None
+    print(f"Error loading TFLite model: {e}")
 
+# TFLite tidak tersedia -> tetap layani request dengan model Keras asli
+if predict_fn is None:
+    try:
+        if MODEL_PATH.exists():
+            predict_fn = load_keras_predict_fn()
+            print("Model loaded successfully (Keras fallback).")
+        else:
+            print(f"Warning: Model not found at {MODEL_PATH}")
+    except Exception as e:
+        print(f"Error loading model: {e}")
+
+try:
     if SCALER_PATH.exists():
         scaler = joblib.load(SCALER_PATH)
+        # Parameter StandardScaler diekstrak sekali sebagai float32, sehingga transform
+        # per batch cukup (x - mean) * inv_scale tanpa validasi sklearn
+        scaler_mean = scaler.mean_.astype(np.float32)
+        scaler_inv_scale = (1.0 / scaler.scale_).astype(np.float32)
         print("Scaler loaded successfully.")
     else:
         print(f"Warning: Scaler not found at {SCALER_PATH}")
 except Exception as e:
-    print(f"Error loading artifacts: {e}")
+    scaler = None
+    print(f"Error loading scaler: {e}")
+
+
+class PendingRequest:
+    """Satu baris input yang menunggu diproses oleh batch worker."""
+
+    def __init__(self, features):
+        self.features = features
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+request_queue = queue.Queue()
+
+
+def batch_worker():
+    """
+    Mengambil request dari queue hingga MAX_BATCH_SIZE atau MAX_LATENCY_MS tercapai,
+    lalu menjalankan scaling + prediksi sekali untuk seluruh batch.
+    """
+    while True:
+        batch = [request_queue.get()]
+        deadline = time.monotonic() + MAX_LATENCY_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(request_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            input_data = np.vstack([item.features for item in batch])
+            scaled_data = (input_data - scaler_mean) * scaler_inv_scale
+            prediction_prob = predict_fn(scaled_data)
+            for item, prob in zip(batch, prediction_prob):
+                item.result = float(prob[0])
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+
+
+if predict_fn and scaler:
+    threading.Thread(target=batch_worker, daemon=True).start()
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    if not model or not scaler:
+    if not predict_fn or not scaler:
         return jsonify({'error': 'Model or Scaler not initialized'}), 500
 
     try:
         data = request.get_json(force=True)
         # Asumsi data dikirim sebagai list of values atau dictionary yang sesuai
         # Untuk simplifikasi, kita anggap input adalah list of features
-        input_data = np.array(data['features']).reshape(1, -1)
-        
-        # Preprocessing (Scaling)
-        scaled_data = scaler.transform(input_data)
-        
-        # Prediction
-        prediction_prob = model.predict(scaled_data)
-        prediction_class = (prediction_prob > 0.5).astype(int)[0][0]
+        input_data = np.array(data['features'], dtype=np.float32).reshape(1, -1)
+        # Validasi per request agar satu input salah tidak menggagalkan seluruh batch
+        if input_data.shape[1] != scaler.n_features_in_:
+            raise ValueError(
+                f"Expected {scaler.n_features_in_} features, got {input_data.shape[1]}"
+            )
+
+        # Scaling + Prediction dijalankan oleh batch worker
+        pending = PendingRequest(input_data)
+        request_queue.put(pending)
+        if not pending.done.wait(REQUEST_TIMEOUT_S):
+            return jsonify({'error': 'Prediction timed out'}), 503
+        if pending.error is not None:
+            raise pending.error
+
+        prediction_prob = pending.result
+        prediction_class = int(prediction_prob > 0.5)
         
         return jsonify({
-            'prediction_class': int(prediction_class),
-            'prediction_prob': float(prediction_prob[0][0])
+            'prediction_class': prediction_class,
+            'prediction_prob': prediction_prob
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy', 'model_loaded': model is not None})
+    return jsonify({'status': 'healthy', 'model_loaded': predict_fn is not None})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)